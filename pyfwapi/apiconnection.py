@@ -1,14 +1,47 @@
 import asyncio
+import contextlib
+import functools
+import importlib.util
+import logging
+import random
+import time
 import typing as t
 import urllib.parse
+import warnings
 
 import aiolimiter
 from authlib.integrations.httpx_client import AsyncOAuth2Client
-from httpx import Response
+from httpx import Limits, Response
+from pydantic import Discriminator, Tag, TypeAdapter
+from pydantic_core import to_json
 
 from pyfwapi.errors import APIError
 from pyfwapi.log import pyfwapiLog
 from pyfwapi.model.basemodel import APIResponse
+from pyfwapi.model.paged import NestedPaged, Paged, page_kind
+from pyfwapi.util.ttl_cache import TTLCache
+
+MAX_RETRY_DELAY = 30  # seconds
+MAX_REQUEST_RATE = 20  # requests per second, in bursts of up to as many
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+RESOURCE_TTL = 60  # seconds, for single assets and archives
+RESOURCE_CACHE_SIZE = 2048  # assets and archives kept at most
+# Seconds before expiry to refresh a token in the background, picked per connection
+TOKEN_REFRESH_LEEWAY = (60, 240)
+
+# HTTP/2 multiplexes concurrent requests over a single connection. It needs the
+# optional `h2` package (`pip install httpx[http2]`); without it, use HTTP/1.1.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Default headers of every request, merged with per-request headers by httpx
+DEFAULT_HEADERS = {"Accept": "application/json"}
+# Overrides for requests of (binary) files, like renditions and previews
+BINARY_HEADERS = {"Accept": "*/*"}
+# Only merged with caller headers if there are any
+ASSETUPDATE_HEADERS = {
+    "Content-Type": "application/vnd.fotoware.assetupdate+json",
+    "Accept": "application/vnd.fotoware.asset+json",
+}
 
 
 class APIConnection:
@@ -17,7 +50,12 @@ class APIConnection:
     # entity types, like Asset or Rendition.
 
     def __init__(
-        self, endpoint_url: str, *, client_id: str, client_secret: str
+        self,
+        endpoint_url: str,
+        *,
+        client_id: str,
+        client_secret: str,
+        max_rate: float = MAX_REQUEST_RATE,
     ) -> None:
         """
         Connect to an instance of the FotoWare API.
@@ -26,11 +64,23 @@ class APIConnection:
             endpoint_url: URL of the endpoint, e.g. `https://myorg.example.org`
             client_id: the registered non-interactive application's `client_id`
             client_secret: the application's secret
+            max_rate: requests per second. Idle time builds up a budget for a burst
+                of up to as many requests at once.
         """
 
         self.HOST = endpoint_url.removesuffix("/")
         self.TOKEN_ENDPOINT = f"{self.HOST}/fotoweb/oauth2/token"
-        self.rate_limit = aiolimiter.AsyncLimiter(1, 0.8)
+        self.rate_limit = aiolimiter.AsyncLimiter(max_rate, 1.0)
+        self.token_lock = asyncio.Lock()
+        self.token_refresh: asyncio.Task | None = None
+        # Jittered, so that many workers started together don't all refresh their
+        # tokens at the same moment
+        self.token_leeway = random.randint(*TOKEN_REFRESH_LEEWAY)
+        # Validated resources by path. Kept here, where changes to them are committed,
+        # so that a commit can drop what it changes.
+        self.resources: TTLCache[str, APIResponse] = TTLCache(
+            ttl=RESOURCE_TTL, maxsize=RESOURCE_CACHE_SIZE
+        )
 
         self.client = AsyncOAuth2Client(
             client_id=client_id,
@@ -38,24 +88,74 @@ class APIConnection:
             token_endpoint_auth_method="client_secret_post",
             token_endpoint=self.TOKEN_ENDPOINT,
             grant_type="client_credentials",
+            headers=DEFAULT_HEADERS,
+            # No transport of our own: httpx only honours proxies from the environment
+            # (HTTP_PROXY, HTTPS_PROXY, ALL_PROXY, NO_PROXY) when it builds its own.
+            http2=HTTP2_AVAILABLE,
+            limits=Limits(
+                max_connections=100, max_keepalive_connections=20, keepalive_expiry=60
+            ),
         )
 
+    async def warmup(self):
+        """
+        Fetch the OAuth2 token ahead of the first request. This also opens the pooled
+        connection to the host, so the first API call doesn't pay for both.
+
+        Any API request needs the token, so there is no request to make alongside it.
+        """
+        await self.ensure_token()
+
     async def ensure_token(self):
         """Ensure that the OAuth2 client has fetched a token."""
-        # AsyncOAuth2Clien locks to ensure no race conditions when fetching the token.
-        if not self.client.token:
+        if self.client.token:
+            # Refresh a token that's about to expire in the background, so that this
+            # request can still use the current (valid) token without waiting.
+            # AsyncOAuth2Client itself only refreshes a token once it has expired.
+            expires_at = self.client.token.get("expires_at")
+            expiring = (
+                expires_at is not None and expires_at - time.time() < self.token_leeway
+            )
+            if expiring and self.token_refresh is None:
+                self.token_refresh = asyncio.create_task(self._refresh_token())
+            return
+        # AsyncOAuth2Client only locks when refreshing an expired token, not when
+        # fetching the first one. Concurrent first requests would all fetch a token.
+        async with self.token_lock:
+            if not self.client.token:
+                await self.client.fetch_token()  # type: ignore
+
+    async def _refresh_token(self):
+        try:
             await self.client.fetch_token()  # type: ignore
+        except Exception as err:
+            # Not fatal: the client refreshes the token itself once it has expired.
+            pyfwapiLog.warning("Background token refresh failed: %s", err)
+        finally:
+            self.token_refresh = None
+
+    async def __aenter__(self) -> t.Self:
+        await self.warmup()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def __del__(self) -> None:
+        # Closing needs the event loop, which can't be used safely from here: only warn
+        client = getattr(self, "client", None)
+        if client is not None and not client.is_closed:
+            warnings.warn(
+                f"Unclosed {self!r}. Use `async with APIConnection(...)`.",
+                ResourceWarning,
+                source=self,
+            )
 
-    def __del__(self):
-        # Close connection when this object is destroyed...
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(self.client.aclose())
-            else:
-                loop.run_until_complete(self.client.aclose())
-        except Exception:
-            pass
+    async def aclose(self):
+        """Close the connection pool. Prefer `async with APIConnection(...)`."""
+        if self.token_refresh is not None:
+            self.token_refresh.cancel()
+        await self.client.aclose()
 
     async def GET(
         self, path: str, /, *, headers: t.Mapping[str, str] = {}, **kwargs
@@ -67,16 +167,18 @@ class APIConnection:
             httpx.HTTPStatusError: API response if the status code is not 200.
         """
         await self.ensure_token()
-        pyfwapiLog.debug(f"GET {urllib.parse.unquote(path)}")
-        async with self.rate_limit:
-            r = await self.client.get(
-                self.HOST + path,
-                headers={"Accept": "application/json", **headers},
-                follow_redirects=True,
-                **kwargs,
-            )
-            r.raise_for_status()
-            return r
+        if pyfwapiLog.isEnabledFor(logging.DEBUG):
+            pyfwapiLog.debug("GET %s", urllib.parse.unquote(path))
+        # Only wait for capacity, don't hold it: the bucket refills during the request
+        await self.rate_limit.acquire()
+        r = await self.client.get(
+            self.HOST + path,
+            headers=headers,
+            follow_redirects=True,
+            **kwargs,
+        )
+        r.raise_for_status()
+        return r
 
     async def PATCH(
         self,
@@ -84,7 +186,7 @@ class APIConnection:
         /,
         *,
         headers: t.Mapping[str, str] = {},
-        json: t.Any = {},
+        json: t.Any = None,
         **kwargs,
     ) -> Response:
         """
@@ -93,27 +195,27 @@ class APIConnection:
         Args:
             path: the resource endpoint, starting with /
             headers: arbitrary HTTP headers for this request
-            data: any JSON data to be sent along
+            json: any JSON data to be sent along
 
         Raises:
             httpx.HTTPStatusError: API response if the status code is not 2xx.
         """
         await self.ensure_token()
-        pyfwapiLog.debug(f"PATCH {urllib.parse.unquote(path)}")
-        async with self.rate_limit:
-            r = await self.client.patch(
-                self.HOST + path,
-                headers={
-                    "Content-Type": "application/vnd.fotoware.assetupdate+json",
-                    "Accept": "application/vnd.fotoware.asset+json",
-                    **headers,
-                },
-                follow_redirects=True,
-                json=json,
-                **kwargs,
-            )
-            r.raise_for_status()
-            return r
+        if pyfwapiLog.isEnabledFor(logging.DEBUG):
+            pyfwapiLog.debug("PATCH %s", urllib.parse.unquote(path))
+        if json is not None:
+            kwargs["content"] = to_json(json)
+        await self.rate_limit.acquire()
+        r = await self.client.patch(
+            self.HOST + path,
+            headers=(
+                {**ASSETUPDATE_HEADERS, **headers} if headers else ASSETUPDATE_HEADERS
+            ),
+            follow_redirects=True,
+            **kwargs,
+        )
+        r.raise_for_status()
+        return r
 
     async def POST(
         self,
@@ -121,7 +223,7 @@ class APIConnection:
         /,
         *,
         headers: t.Mapping[str, str] = {},
-        json: t.Any = {},
+        json: t.Any = None,
         **kwargs,
     ) -> Response:
         """
@@ -130,23 +232,29 @@ class APIConnection:
         Args:
             path: the resource endpoint, starting with /
             headers: arbitrary HTTP headers for this request
-            data: any JSON data to be sent along
+            json: any JSON data to be sent along. Its Content-Type defaults to
+                `application/json`.
 
         Raises:
             httpx.HTTPStatusError: if API response is not 2xx
         """
         await self.ensure_token()
-        pyfwapiLog.debug(f"POST {urllib.parse.unquote(path)}")
-        async with self.rate_limit:
-            r = await self.client.post(
-                self.HOST + path,
-                headers={"Accept": "application/json", **headers},
-                json=json,
-                follow_redirects=False,
-                **kwargs,
-            )
-            r.raise_for_status()
-            return r
+        if pyfwapiLog.isEnabledFor(logging.DEBUG):
+            pyfwapiLog.debug("POST %s", urllib.parse.unquote(path))
+        if json is not None:
+            # Serialize in Rust (pydantic_core) rather than with the stdlib json module
+            kwargs["content"] = to_json(json)
+            if "Content-Type" not in headers:
+                headers = {"Content-Type": "application/json", **headers}
+        await self.rate_limit.acquire()
+        r = await self.client.post(
+            self.HOST + path,
+            headers=headers,
+            follow_redirects=False,
+            **kwargs,
+        )
+        r.raise_for_status()
+        return r
 
     async def paginated[T: APIResponse](
         self, path: str, /, *, type: type[T], headers: t.Mapping[str, str] = {}
@@ -159,59 +267,166 @@ class APIConnection:
             type: the response JSON type (APIResponse)
             headers: arbitrary HTTP headers for this request
         """
-        page_url: str | None = path
-
-        while page_url is not None or page_url != "":
-            full_results = await self.GET(page_url, headers=headers)
-            full_results = full_results.json()
-
-            # Some first pages are different
-            page: t.Mapping[str, t.Any] = full_results.get("assets", full_results)
-            data = page.get("data", [])
-
-            if len(data) == 0:
-                break
-            for d in data:
-                yield type.model_validate(d)
+        next_page: asyncio.Task[Response] | None = asyncio.create_task(
+            self.GET(path, headers=headers)
+        )
 
-            # For next iteration, set page_url to None or next page
-            page_url = None
-            page_url: str | None = page.get("paging", dict()).get("next", None)
+        pages = page_adapter(type)
+        try:
+            while next_page is not None:
+                # Parse and validate the whole page in one go, straight from the bytes
+                page = pages.validate_json((await next_page).content)
+                next_page = None
+
+                # Some first pages are different
+                if isinstance(page, NestedPaged):
+                    page = page.assets
+
+                if not page.data:
+                    break
+
+                # Fetch the next page while the consumer works through this one
+                page_url = page.paging.next if page.paging is not None else None
+                if page_url:
+                    next_page = asyncio.create_task(self.GET(page_url, headers=headers))
+
+                for item in page.data:
+                    yield item
+        finally:
+            # The consumer may stop early: don't leave a prefetch dangling
+            if next_page is not None:
+                if not next_page.done():
+                    next_page.cancel()
+                elif not next_page.cancelled():
+                    # Retrieve a failed prefetch's error, which no one is waiting for
+                    next_page.exception()
 
     async def retrying(
-        self, path: str, *, retries: int | None = None, delay: float | None = None
+        self,
+        path: str,
+        *,
+        retries: int | None = None,
+        delay: float | None = None,
+        max_wait: float | None = None,
     ) -> Response:
         """
         GET and upon non-200, retry to get the binary stream of a file.
 
         Args:
             path: the local tenant-local path to the resource
-            retries: number of retries (default: 10)
-            delay: how to long to waiting between retries (in seconds)
+            retries: number of attempts, at least 1 (default: 10)
+            delay: how long to wait before the first retry, in seconds (default: 0.5).
+                This doubles with every further retry, up to 30 seconds.
+            max_wait: give up early, instead of waiting past this many seconds since
+                the first attempt (default: only limited by `retries`)
 
         Raises:
-            httpx.HTTPStatusError: API response if the status code is not 200.
+            ValueError: if `retries` is less than 1
+            httpx.HTTPStatusError: API response if the status code is a client error
+                (4xx, except 429 Too Many Requests), or still not 200 after retrying.
             pyfwapi.errors.APIError: The response was 200, but still no success.
         """
+        async with self._polling(
+            path, retries=retries, delay=delay, max_wait=max_wait
+        ) as resp:
+            await resp.aread()
+        return resp
+
+    async def retrying_stream(
+        self,
+        path: str,
+        *,
+        retries: int | None = None,
+        delay: float | None = None,
+        max_wait: float | None = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> t.AsyncGenerator[bytes, None]:
+        """
+        Like retrying(), but stream the body of the eventual 200 response in chunks of
+        `chunk_size`, instead of reading it into memory at once.
 
+        Raises:
+            ValueError: if `retries` is less than 1
+            httpx.HTTPStatusError: API response if the status code is a client error
+                (4xx, except 429 Too Many Requests), or still not 200 after retrying.
+            pyfwapi.errors.APIError: The response was 200, but still no success.
+        """
+        async with self._polling(
+            path, retries=retries, delay=delay, max_wait=max_wait
+        ) as resp:
+            async for chunk in resp.aiter_bytes(chunk_size):
+                yield chunk
+
+    @contextlib.asynccontextmanager
+    async def _polling(
+        self,
+        path: str,
+        *,
+        retries: int | None,
+        delay: float | None,
+        max_wait: float | None,
+    ) -> t.AsyncGenerator[Response, None]:
+        # The poll and backoff loop of retrying() and retrying_stream(). Provides the
+        # 200 response with its body not read yet, while its connection is open.
         retries = retries if retries is not None else 10
-        delay = delay if delay is not None else 5
+        delay = delay if delay is not None else 0.5
+        if retries < 1:
+            raise ValueError(f"Need at least 1 attempt, not {retries}")
 
         await self.ensure_token()
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+
+        for attempt in range(retries):
+            async with self.client.stream(
+                "GET", self.HOST + path, headers=BINARY_HEADERS
+            ) as resp:
+                if resp.status_code == 200:
+                    # 200 OK: rendition is ready
+                    yield resp
+                    return
+                if is_fatal(resp.status_code):
+                    # e.g. 404 Not Found: retrying won't help
+                    resp.raise_for_status()
+
+            if attempt + 1 < retries:
+                # 202 Accepted: the rendition is not ready yet
+                wait = retry_delay(attempt, delay)
+                if past_deadline(deadline, wait):
+                    break
+                await asyncio.sleep(wait)
 
-        while retries > 0:
-            resp = await self.client.get(self.HOST + path)
-            if resp.status_code == 200:
-                # 200 OK: rendition is ready
-                return resp
+        pyfwapiLog.error("Download '%s' failed after %d attempts", path, attempt + 1)
+        resp.raise_for_status()
+        raise APIError(f"Download '{path}' failed after {attempt + 1} attempts")
 
-            if resp.status_code != 202:
-                # 202 Accepted: the rendition is not ready yet
-                retries -= 1
 
-            retries -= 1
-            await asyncio.sleep(delay)
+@functools.cache
+def page_adapter[T: APIResponse](
+    type: type[T],
+) -> TypeAdapter[NestedPaged[T] | Paged[T]]:
+    """The validator of pages of `type`, built once per type."""
+    return TypeAdapter(
+        t.Annotated[
+            t.Annotated[NestedPaged[type], Tag("nested")]
+            | t.Annotated[Paged[type], Tag("paged")],
+            Discriminator(page_kind),
+        ]
+    )
 
-        pyfwapiLog.error(f"Download '{path}' failed after {retries}")
-        resp.raise_for_status()
-        raise APIError(f"Download '{path}' failed after {retries}")
+
+def retry_delay(attempt: int, delay: float) -> float:
+    """
+    Exponential backoff from `delay`, capped, with jitter so that many waiting clients
+    don't poll in lockstep.
+    """
+    return min(MAX_RETRY_DELAY, delay * 2**attempt) * (0.5 + random.random())
+
+
+def past_deadline(deadline: float | None, wait: float) -> bool:
+    """Whether waiting another `wait` seconds would pass the (monotonic) deadline."""
+    return deadline is not None and time.monotonic() + wait > deadline
+
+
+def is_fatal(status_code: int) -> bool:
+    """Whether a response status is a client error that retrying won't resolve."""
+    return 400 <= status_code < 500 and status_code != 429
@@ -1,4 +1,6 @@
+import os
 import typing as t
+from pathlib import Path
 
 from pyfwapi.apiconnection import APIConnection
 from pyfwapi.errors import CollectionNotMovableTo
@@ -60,7 +62,7 @@ class ChangeManager:
     # upload new assets
     def upload(
         self,
-        file: t.BinaryIO,
+        file: t.BinaryIO | os.PathLike | str,
         destination: Collection,
         *,
         filename: str | None = None,
@@ -71,7 +73,8 @@ class ChangeManager:
         Upload a new asset, from a local file of filestream.
 
         Args:
-            file: An opened file-like stream.
+            file: An opened file-like stream, or the path to a local file. A file at a
+                path is read chunk by chunk during the upload, not into memory at once.
             destination: the archive to upload to.
             filename: the file's name, taken from file.name if None.
             fields: arbitrairy custom metadata.
@@ -84,16 +87,22 @@ class ChangeManager:
         if not destination.canUploadTo:
             raise CollectionNotMovableTo(destination.name)
 
-        fn = filename or file.name
-        contents = memoryview(file.read())
-        contents.nbytes
+        if isinstance(file, (str, os.PathLike)):
+            contents = Path(file)
+            fn = filename or contents.name
+            filesize = contents.stat().st_size
+        else:
+            contents = file.read()
+            fn = filename or file.name
+            filesize = len(contents)
+
         self.state.add_task(
             ChangeTask(
                 change=UploadRequest(
                     contents,
                     destination.href,
                     fn,
-                    contents.nbytes,
+                    filesize,
                     fields or [],
                     attributes or [],
                 )
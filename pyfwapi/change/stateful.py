@@ -1,10 +1,10 @@
-import dataclasses
+import asyncio
+import itertools
+import time
 import typing as t
-from dataclasses import dataclass, field
-from uuid import uuid4
+from dataclasses import dataclass, field, replace
+from pathlib import Path
 
-import aiohttp
-from aiohttp import BytesPayload
 from httpx import HTTPStatusError
 
 from pyfwapi.apiconnection import APIConnection
@@ -14,6 +14,16 @@ from pyfwapi.model.asset import MetadataFieldType
 from pyfwapi.model.background_tasks import BackgroundTaskResponse, TaskStatus
 from pyfwapi.model.upload_request import BatchUploadInfo, BatchUploadStatus
 
+# Chunks of a single upload in flight at the same time
+UPLOAD_CHUNK_CONCURRENCY = 4
+
+# Backgrounded tasks are polled after 1s, 2s, 4s... up to once a minute
+POLL_INTERVAL = 1  # seconds
+MAX_POLL_INTERVAL = 60  # seconds
+
+# Task IDs only need to be unique within this process
+_task_ids = itertools.count()
+
 
 class MetadataPatch(t.TypedDict):
     id: int
@@ -30,15 +40,16 @@ class ValueMetadataField(t.TypedDict):
     value: MetadataFieldType
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MetadataRequest:
     asset_href: str
     new_metadata: dict[int, ValueMetadataField]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UploadRequest:
-    contents: memoryview
+    # The contents in memory, or a local file that is read chunk by chunk
+    contents: bytes | Path
     destination: str
     filename: str
     filesize: int
@@ -46,17 +57,20 @@ class UploadRequest:
     attributes: list[MetadataAttributesPatch]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MoveRequest:
     asset_hrefs: list[str]
     destination: str
 
 
-@dataclass
+type ChangeStatus = t.Literal["uncommitted", "submitted", "done", "failed"]
+
+
+@dataclass(slots=True)
 class ChangeTask:
     change: MoveRequest | UploadRequest | MetadataRequest
-    status: t.Literal["uncommitted", "submitted", "done", "failed"] = "uncommitted"
-    id: bytes = field(default_factory=lambda: uuid4().bytes)
+    status: ChangeStatus = "uncommitted"
+    id: int = field(default_factory=lambda: next(_task_ids))
 
     def __hash__(self) -> int:
         return hash(self.id)
@@ -73,67 +87,211 @@ class BaseChangeManager:
     Consider using ChangeManager for a higher-level API.
     """
 
-    def __init__(self) -> None:
-        self.tasks: dict[bytes, ChangeTask] = dict()
-        self.task_statuslocation: dict[bytes, str] = dict()
+    def __init__(self, *, concurrency: int = 16) -> None:
+        """
+        Args:
+            concurrency: how many requests may be in flight at the same time
+        """
+        self.tasks: dict[int, ChangeTask] = dict()
+        self.task_statuslocation: dict[int, str] = dict()
+        # status -> IDs of the tasks with that status, kept up to date by _set_status
+        self.by_status: dict[ChangeStatus, set[int]] = {
+            status: set() for status in t.get_args(ChangeStatus.__value__)
+        }
+        # task ID -> when to poll it next, and the interval after that
+        self.next_poll: dict[int, float] = dict()
+        self.poll_interval: dict[int, float] = dict()
+        self.concurrency = concurrency
+        # Change type -> the method that commits it
+        self.committers: dict[type, t.Callable[..., t.Awaitable[None]]] = {
+            MetadataRequest: self._commit_metadata,
+            MoveRequest: self._commit_move,
+            UploadRequest: self._commit_upload,
+        }
+        # asset href -> ID of the uncommitted task that changes its metadata
+        self.pending_metadata: dict[str, int] = dict()
+        # destination href -> ID of the uncommitted task that moves assets there
+        self.pending_moves: dict[str, int] = dict()
+
+    def add_task(self, task: ChangeTask) -> ChangeTask:
+        """
+        Add a task to be committed. Returns the task that tracks the change: metadata
+        changes to an asset that already has uncommitted changes are merged into its
+        task, so that the asset is PATCHed once. Likewise, moves to the same
+        destination are merged into a single background task.
+        """
+        if isinstance(task.change, MetadataRequest):
+            href = task.change.asset_href
+            pending = self.tasks.get(self.pending_metadata.get(href, -1))
+            if (
+                pending is not None
+                and pending.status == "uncommitted"
+                and isinstance(pending.change, MetadataRequest)
+            ):
+                pending.change = MetadataRequest(
+                    href, pending.change.new_metadata | task.change.new_metadata
+                )
+                return pending
+            self.pending_metadata[href] = task.id
+
+        elif isinstance(task.change, MoveRequest):
+            destination = task.change.destination
+            pending = self.tasks.get(self.pending_moves.get(destination, -1))
+            if (
+                pending is not None
+                and pending.status == "uncommitted"
+                and isinstance(pending.change, MoveRequest)
+            ):
+                pending.change = MoveRequest(
+                    pending.change.asset_hrefs + task.change.asset_hrefs, destination
+                )
+                return pending
+            self.pending_moves[destination] = task.id
 
-    def add_task(self, task: ChangeTask):
         self.tasks[task.id] = task
+        self.by_status[task.status].add(task.id)
+        return task
+
+    def _set_status(self, task: ChangeTask, status: ChangeStatus):
+        self.by_status[task.status].discard(task.id)
+        self.by_status[status].add(task.id)
+        task.status = status
+
+    def _with_status(self, status: ChangeStatus) -> list[ChangeTask]:
+        # IDs count up, so this is the order in which the tasks were added
+        return [self.tasks[id] for id in sorted(self.by_status[status])]
 
     async def commit(self, *, conn: APIConnection, await_done: bool = True):
-        """Commit changes ready to commit."""
-        for task in self.tasks.values():
-            if task.status != "uncommitted":
-                continue
-            await self.commit_uncommitted(task, conn=conn)
+        """
+        Commit changes ready to commit, concurrently. A change whose request fails is
+        marked as failed, without stopping the others.
+        """
+        # The changes are independent requests: dispatch them together, bounded by a
+        # semaphore. The connection's rate limiter still applies to each request.
+        sem = asyncio.Semaphore(self.concurrency)
+        uncommitted = self._with_status("uncommitted")
+        results = await asyncio.gather(
+            *(
+                self._bounded(sem, self.commit_uncommitted(ch, conn=conn))
+                for ch in uncommitted
+            ),
+            return_exceptions=True,
+        )
+
+        # Every commit has settled: no status changes after commit() returns
+        for ch, result in zip(uncommitted, results):
+            if isinstance(result, Exception):
+                pyfwapiLog.error("Committing %s failed, because: %s", ch, result)
+                self._set_status(ch, "failed")
+
+    async def _bounded[T](self, sem: asyncio.Semaphore, aw: t.Awaitable[T]) -> T:
+        async with sem:
+            return await aw
 
     async def commit_uncommitted(self, ch: ChangeTask, *, conn: APIConnection):
         """Commit a single uncommitted ChangeTask."""
-        if isinstance(ch.change, MetadataRequest):
-            success = await self.patch_metadata(ch.change, conn=conn)
-            if success:
-                ch.status = "done"
-                return
-            ch.status = "failed"
-
-        elif isinstance(ch.change, MoveRequest):
-            task = await self.move_asset(ch.change, conn=conn)
-            ch.status = "submitted"
-            self.task_statuslocation[ch.id] = task.location
-
-        elif isinstance(ch.change, UploadRequest):
-            task = await self.upload_asset(ch.change, conn=conn)
-            ch.status = "submitted"
-            self.task_statuslocation[ch.id] = f"/fotoweb/api/uploads/{task.id}/status"
+        commit = self.committers[type(ch.change)]
+        await commit(ch, ch.change, conn=conn)
+
+    async def _commit_metadata(
+        self, ch: ChangeTask, change: MetadataRequest, *, conn: APIConnection
+    ):
+        # Changes added from now on can't be merged into this one anymore
+        self.pending_metadata.pop(change.asset_href, None)
+        try:
+            success = await self.patch_metadata(change, conn=conn)
+        finally:
+            # Even a failed PATCH may have changed the asset
+            conn.resources.invalidate(change.asset_href)
+        self._set_status(ch, "done" if success else "failed")
+
+    async def _commit_move(
+        self, ch: ChangeTask, change: MoveRequest, *, conn: APIConnection
+    ):
+        self.pending_moves.pop(change.destination, None)
+        try:
+            task = await self.move_asset(change, conn=conn)
+        finally:
+            for href in change.asset_hrefs:
+                conn.resources.invalidate(href)
+        self._set_status(ch, "submitted")
+        self.task_statuslocation[ch.id] = task.location
+
+    async def _commit_upload(
+        self, ch: ChangeTask, change: UploadRequest, *, conn: APIConnection
+    ):
+        task = await self.upload_asset(change, conn=conn)
+        # The contents have been sent: don't keep them in memory
+        ch.change = replace(change, contents=b"")
+        self._set_status(ch, "submitted")
+        self.task_statuslocation[ch.id] = f"/fotoweb/api/uploads/{task.id}/status"
 
     async def check_submitted(self, *, conn: APIConnection):
-        """Check the processing status of backgrounded tasks, like moves and uploads."""
-        for task in self.tasks.values():
-            if task.status != "submitted":
-                continue
-            location = self.task_statuslocation.get(task.id)
-            if location is None:
-                continue
-
-            if isinstance(task.change, MoveRequest):
-                r = await conn.GET(location)
-                info = TaskStatus.model_validate_json(r.content)
-                match info.task.status:
-                    case "done":
-                        task.status = "done"
-                    case "failed":
-                        task.status = "failed"
-                        pyfwapiLog.warn(f"Move failed (fn:{task.change.asset_hrefs})")
-
-            if isinstance(task.change, UploadRequest):
-                r = await conn.GET(location)
-                info = BatchUploadStatus.model_validate_json(r.content)
-                match info.status:
-                    case "done":
-                        task.status = "done"
-                    case "failed":
-                        task.status = "failed"
-                        pyfwapiLog.warn(f"Upload failed (fn:{task.change.filename})")
+        """
+        Check the processing status of backgrounded tasks, like moves and uploads.
+
+        Tasks are checked concurrently. A task that is still processing is checked
+        less often every time. If no task is due for a check yet, this waits until the
+        first one is, so it can be called in a loop without flooding the API or
+        blocking the event loop.
+        """
+        sem = asyncio.Semaphore(self.concurrency)
+        now = time.monotonic()
+        polled = [ch.id for ch in self._with_status("submitted")]
+        submitted = [
+            self.tasks[id] for id in polled if self.next_poll.get(id, now) <= now
+        ]
+        if not submitted:
+            # Also yields to the event loop if there is nothing left to check at all
+            first_due = min((self.next_poll[id] for id in polled), default=now)
+            await asyncio.sleep(first_due - now)
+            return
+        results = await asyncio.gather(
+            *(self._bounded(sem, self.check_task(ch, conn=conn)) for ch in submitted),
+            return_exceptions=True,
+        )
+
+        now = time.monotonic()
+        for ch, result in zip(submitted, results):
+            if isinstance(result, Exception):
+                # A failed check isn't a failed task: check it again later
+                pyfwapiLog.warning("Checking %s failed, because: %s", ch, result)
+            if ch.status == "submitted":
+                interval = self.poll_interval.get(ch.id, POLL_INTERVAL)
+                self.next_poll[ch.id] = now + interval
+                self.poll_interval[ch.id] = min(MAX_POLL_INTERVAL, 2 * interval)
+            else:
+                self.next_poll.pop(ch.id, None)
+                self.poll_interval.pop(ch.id, None)
+
+    async def check_task(self, task: ChangeTask, *, conn: APIConnection):
+        """Check the processing status of a single backgrounded task."""
+        location = self.task_statuslocation.get(task.id)
+        if location is None:
+            return
+
+        if isinstance(task.change, MoveRequest):
+            r = await conn.GET(location)
+            info = TaskStatus.model_validate_json(r.content)
+            match info.task.status:
+                case "done":
+                    self._set_status(task, "done")
+                    # The assets may have been fetched again while they were moving
+                    for href in task.change.asset_hrefs:
+                        conn.resources.invalidate(href)
+                case "failed":
+                    self._set_status(task, "failed")
+                    pyfwapiLog.warning("Move failed (fn:%s)", task.change.asset_hrefs)
+
+        if isinstance(task.change, UploadRequest):
+            r = await conn.GET(location)
+            info = BatchUploadStatus.model_validate_json(r.content)
+            match info.status:
+                case "done":
+                    self._set_status(task, "done")
+                case "failed":
+                    self._set_status(task, "failed")
+                    pyfwapiLog.warning("Upload failed (fn:%s)", task.change.filename)
 
     async def patch_metadata(
         self, item: MetadataRequest, *, conn: APIConnection
@@ -144,10 +302,10 @@ class BaseChangeManager:
             await conn.PATCH(
                 item.asset_href,
                 headers={"Content-Type": "application/vnd.fotoware.assetupdate+json"},
-                json={"metadata": dataclasses.asdict(item)["new_metadata"]},
+                json={"metadata": item.new_metadata},
             )
         except HTTPStatusError as err:
-            pyfwapiLog.warning(f"{item} failed, because:", err)
+            pyfwapiLog.warning("%s failed, because: %s", item, err)
             return False
         else:
             return True
@@ -156,7 +314,7 @@ class BaseChangeManager:
         self, item: MoveRequest, *, conn: APIConnection
     ) -> BackgroundTaskResponse:
         """Handle a single MoveRequest."""
-        assets = list(({"href": href} for href in item.asset_hrefs))
+        assets = [{"href": href} for href in item.asset_hrefs]
         d = await conn.POST(
             "/fotoweb/me/background-tasks/",
             headers={
@@ -192,8 +350,13 @@ class BaseChangeManager:
 
         upload_info = BatchUploadInfo.model_validate_json(r.content)
 
-        for i in range(upload_info.numChunks):
-            await self._upload_asset_chunk(i, upload_info, item, conn=conn)
+        # Chunks are independent, indexed byte ranges: upload a few at the same time
+        sem = asyncio.Semaphore(UPLOAD_CHUNK_CONCURRENCY)
+        chunks = (
+            self._upload_asset_chunk(i, upload_info, item, conn=conn)
+            for i in range(upload_info.numChunks)
+        )
+        await asyncio.gather(*(self._bounded(sem, chunk) for chunk in chunks))
 
         return upload_info
 
@@ -210,21 +373,25 @@ class BaseChangeManager:
         chunk_size = min([upload_info.chunkSize, item.filesize])
         chunk_end = chunk_offset + chunk_size
 
-        with aiohttp.MultipartWriter("form-data") as mp:
-            bytes_part = item.contents[chunk_offset:chunk_end]
-            part = mp.append_payload(
-                BytesPayload(
-                    bytes_part,
-                    content_type="application/octet-stream",
-                )
+        if isinstance(item.contents, Path):
+            bytes_part = await asyncio.to_thread(
+                read_range, item.contents, chunk_offset, chunk_size
             )
-            part.set_content_disposition("form-data", name="chunk", filename="chunk")
+        else:
+            bytes_part = item.contents[chunk_offset:chunk_end]
+
+        # The connection is httpx-based: let it encode the multipart/form-data body
+        resp = await conn.POST(
+            f"/fotoweb/api/uploads/{upload_info.id}/chunks/{i}",
+            files={"chunk": ("chunk", bytes_part, "application/octet-stream")},
+        )
+
+        if resp.status_code != 204:
+            raise UploadException(resp.text)
 
-            resp = await conn.POST(
-                f"/fotoweb/api/uploads/{upload_info.id}/chunks/{i}",
-                json=mp,
-                headers=mp.headers,
-            )
 
-            if resp.status_code != 204:
-                raise UploadException(resp.text)
+def read_range(path: Path, offset: int, size: int) -> bytes:
+    """Read `size` bytes from a local file, starting at `offset`."""
+    with path.open("rb") as f:
+        f.seek(offset)
+        return f.read(size)
@@ -1,6 +1,8 @@
 import typing as t
 from datetime import datetime
 
+from pydantic import PrivateAttr, field_validator
+
 from pyfwapi.model.basemodel import APIResponse
 from pyfwapi.model.preview_rendition import AssetPreview, AssetRendition
 
@@ -23,12 +25,6 @@ class BuiltinField(APIResponse):
     value: MetadataFieldType | None
 
 
-class MetadataField(APIResponse):
-    """Any metadata field (that is, not built-in)"""
-
-    value: MetadataFieldType
-
-
 class ImageAttributes(APIResponse):
     pixelwidth: int
     pixelheight: int
@@ -59,7 +55,7 @@ class Asset(APIResponse):
     archiveHREF: str
 
     builtinFields: list[BuiltinField]
-    metadata: dict[int, MetadataField]
+    metadata: dict[int, MetadataFieldType]
     attributes: Attributes | None = None
 
     previews: list[AssetPreview] | None
@@ -69,6 +65,33 @@ class Asset(APIResponse):
 
     archiveId: int
 
+    _builtin_index: dict[BuiltinFieldName, MetadataFieldType | None] = PrivateAttr()
+
+    @field_validator("metadata", mode="before")
+    @classmethod
+    def unwrap_metadata_values(cls, value: t.Any) -> t.Any:
+        # The API wraps every metadata value as {"value": ...}: store the values only
+        if isinstance(value, dict):
+            return {
+                k: v.get("value") if isinstance(v, dict) else v
+                for k, v in value.items()
+            }
+        return value
+
+    def model_post_init(self, __context: t.Any) -> None:
+        # Index the builtin fields once, so lookups by name don't scan the list
+        self._builtin_index = {f.field: f.value for f in self.builtinFields}
+
+    # Assets are the same if they are the same file, so that e.g. a set deduplicates
+    # search results from multiple archives without comparing every field.
+    def __hash__(self) -> int:
+        return hash(self.physicalFileId)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Asset):
+            return NotImplemented
+        return self.physicalFileId == other.physicalFileId
+
 
 class ImageExport(APIResponse):
     """The result dict of an exported image"""
@@ -82,17 +105,14 @@ def get_builtin[T: t.Any](
     asset: Asset, key: BuiltinFieldName, /, default: T = None
 ) -> MetadataFieldType | None | T:
     """Get a metadata value, from a limited list of builtin fields"""
-    for field in asset.builtinFields:
-        if field.field == key:
-            return field.value
-    return default
+    return asset._builtin_index.get(key, default)
 
 
 def get_metadata[T: t.Any](
     asset: Asset, key: int, /, default: T = None
 ) -> MetadataFieldType | None | T:
     """Get a metadata value, from a customizable list of numbered metadata fields"""
-    return asset.metadata[key].value
+    return asset.metadata.get(key, default)
 
 
 def select_rendition(
@@ -108,20 +128,18 @@ def select_rendition(
     if asset.renditions is None:
         return None
 
-    qualified = filter(lambda r: True, asset.renditions)
-
-    if profile is not None:
-        qualified = filter(lambda i: i.profile == profile, qualified)
-    if original is not None:
-        qualified = filter(lambda i: original == i.original, qualified)
-
-    # A SIZE equals the length of the longest side. Matching a minimum size, the shortest
-    # (= min()) side should determine match.
-    qualified = filter(lambda i: size <= min([i.height, i.width]), qualified)
-    qualified = filter(lambda i: width <= i.width, qualified)
-    qualified = filter(lambda i: height <= i.height, qualified)
-
-    return next(qualified, None)  # next = first = qualified[0]
+    for rendition in asset.renditions:
+        if profile is not None and rendition.profile != profile:
+            continue
+        if original is not None and rendition.original != original:
+            continue
+        # A SIZE equals the length of the longest side. Matching a minimum size, the
+        # shortest side should determine match.
+        w, h = rendition.width, rendition.height
+        if size > (h if h < w else w) or width > w or height > h:
+            continue
+        return rendition
+    return None
 
 
 def select_preview(
@@ -136,12 +154,10 @@ def select_preview(
     if asset.previews is None:
         return None
 
-    qualified = filter(lambda r: True, asset.previews)
-
-    qualified = filter(lambda i: size <= i.size, qualified)
-    qualified = filter(lambda i: width <= i.width, qualified)
-    qualified = filter(lambda i: height <= i.height, qualified)
-    if square is not None:
-        qualified = filter(lambda i: i.square is square, qualified)
-
-    return next(qualified)  # next = first = qualified[0]
+    for preview in asset.previews:
+        if preview.size < size or preview.width < width or preview.height < height:
+            continue
+        if square is not None and preview.square is not square:
+            continue
+        return preview
+    return None
@@ -1,11 +1,16 @@
-from pydantic import BaseModel, ConfigDict, field_validator
+import typing as t
+
+from pydantic import BaseModel, ConfigDict, model_validator
 
 
 class APIResponse(BaseModel):
-    model_config = ConfigDict(extra="allow", frozen=True)
+    # Undeclared keys in API responses are dropped, not stored on every instance
+    model_config = ConfigDict(extra="ignore", frozen=True, revalidate_instances="never")
 
-    @field_validator("*", mode="before")
-    def empty_str_to_none(cls, value):
-        if value == "":
-            return None
-        return value
+    @model_validator(mode="before")
+    @classmethod
+    def empty_str_to_none(cls, data: t.Any) -> t.Any:
+        # A single sweep per object, instead of a validator call for every field
+        if isinstance(data, dict) and "" in data.values():
+            return {k: None if v == "" else v for k, v in data.items()}
+        return data
@@ -14,19 +14,20 @@ class FieldNamespace(APIResponse):
 class KnownMetadataField(APIResponse):
     id: int = Field(alias="Id")
     name: str = Field(alias="Name")
-    gui_label: str = Field(alias="GuiLabel")
+    gui_label: str | None = Field(None, alias="GuiLabel")
     field_type: t.Literal["AltLang", "Bag", "Seq", "Single"] = Field(alias="FieldType")
     value_type: t.Literal["Boolean", "Date", "Integer", "Real", "Text"] = Field(
         alias="ValueType"
     )
     namespace: str = Field(alias="Namespace")
-    namespace_label: str = Field(alias="NamespaceLabel")
-    max_size: int = Field(alias="MaxSize")
-    struct_name: str = Field(alias="StructName")
-    struct_label: str = Field(alias="StructLabel")
-    adobe_name: str = Field(alias="AdobeName")
-    core_name: str = Field(alias="CoreName")
-    is_multiline: bool = Field(alias="IsMultiline")
+    namespace_label: str | None = Field(None, alias="NamespaceLabel")
+    max_size: int | None = Field(None, alias="MaxSize")
+    # Empty (or missing) unless the field is part of a struct, or has such a name
+    struct_name: str | None = Field(None, alias="StructName")
+    struct_label: str | None = Field(None, alias="StructLabel")
+    adobe_name: str | None = Field(None, alias="AdobeName")
+    core_name: str | None = Field(None, alias="CoreName")
+    is_multiline: bool = Field(False, alias="IsMultiline")
 
 
 class Services(APIResponse):
@@ -1,15 +1,31 @@
+import typing as t
+
 from pyfwapi.model.basemodel import APIResponse
 
 
 class PagingInfo(APIResponse):
-    """URLs to other pages in this paged resource."""
+    """URLs to other pages in this paged resource. Empty on the first or last page."""
 
-    prev: str
-    next: str
-    first: str
-    last: str
+    prev: str | None = None
+    next: str | None = None
+    first: str | None = None
+    last: str | None = None
 
 
 class Paged[T](APIResponse):
-    data: list[T]
-    paging: PagingInfo | None
+    data: list[T] | None = None
+    paging: PagingInfo | None = None
+
+
+class NestedPaged[T](APIResponse):
+    """A resource with a paged list of assets in it, like the first page of a search."""
+
+    assets: Paged[T]
+
+
+def page_kind(page: t.Any) -> t.Literal["nested", "paged"]:
+    """
+    Whether a page nests its items under "assets". Decided by the key alone, so that
+    a nested page with invalid items fails, instead of passing as an empty page.
+    """
+    return "nested" if isinstance(page, dict) and "assets" in page else "paged"
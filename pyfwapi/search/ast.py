@@ -5,46 +5,108 @@ Search Expressions.
 Consider using SE (Seach Expression) for an easier, fluent-style API.
 """
 
-import textwrap
+import functools
 import typing as t
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, datetime
 
 
-@dataclass
+INDENT = "    " * 2  # per level of nesting in repr()
+
+
+@dataclass(slots=True, frozen=True)
 class SEASTNode:
     """
     An Abstract Syntax Tree node for FotoWare Search Expressions.
 
     Each AST node is either a terminal value with a single argument (VALUE, FIELD) or it
-    its arguments are instances of the AST that it structures.
+    its arguments are instances of the AST that it structures. AND and OR nodes are
+    n-ary: a left-nested chain of the same operator is kept flat. It still renders the
+    same as the nested binary nodes.
     """
 
     type: t.Literal["AND", "OR", "NOT", "FIELD_EQ", "FIELD", "VAL_RANGE", "VALUE"]
-    args: tuple[t.Self | str, t.Self | str | None]
+    args: tuple[t.Self | str | None, ...]
+    # The rendered expression. A node is immutable, so it only has to be rendered once.
+    _str: str | None = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self) -> str:
-        arg1, arg2 = self.args
-        match self.type:
-            case "VALUE" | "FIELD":
-                return str(arg1)
-            case "VAL_RANGE":
-                return f"{str(arg1)}~~{str(arg2)}"
-            case "FIELD_EQ":
-                return f"{str(arg1)}:{str(arg2)}"
-            case "NOT":
-                return f"NOT ( {str(arg1)} )"
-            case "OR" | "AND":
-                return f"( {str(arg1)} ) {self.type} ( {str(arg2)} )"
+        rendered = self._str
+        if rendered is None:
+            rendered = self._render()
+            object.__setattr__(self, "_str", rendered)
+        return rendered
+
+    def _render(self) -> str:
+        # Iterative: a stack of pending strings and nodes, pushed in reverse order, so
+        # that deep expressions don't cost a recursive call per node.
+        parts: list[str] = []
+        stack: list[SEASTNode | str | None] = [self]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, SEASTNode):
+                parts.append(str(item))
+                continue
+            if item._str is not None:
+                # A subexpression that was rendered before
+                parts.append(item._str)
+                continue
+            stack.extend(STR_PARTS[item.type](item.args))
+        return "".join(parts)
 
     def __repr__(self) -> str:
-        arg1, arg2 = self.args
-        if arg2 is None:
-            return f"""( {self.type} {repr(arg1)} )"""
-        return f"""( {self.type}
-{textwrap.indent( repr(arg1), "    "*2)}
-{textwrap.indent( repr(arg2), "    "*2)}
-)"""
+        # Iterative, like __str__. The stack holds literal text, a newline with the
+        # indentation of a depth (int), or a node with its depth.
+        parts: list[str] = []
+        stack: list[str | int | tuple[SEASTNode | str | None, int]] = [(self, 0)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif isinstance(item, int):
+                parts.append("\n" + INDENT * item)
+            else:
+                node, depth = item
+                if not isinstance(node, SEASTNode):
+                    parts.append(repr(node))
+                elif node.args[1] is None:
+                    # ( NOT arg ), on the line of the argument
+                    stack.extend((" )", (node.args[0], depth), f"( {node.type} "))
+                else:
+                    # ( AND, then every argument on its own line, one level deeper
+                    stack.extend((")", depth))
+                    for arg in reversed(node.args):
+                        stack.extend(((arg, depth + 1), depth + 1))
+                    stack.append(f"( {node.type}")
+        return "".join(parts)
+
+
+def _junction_parts(type: t.Literal["AND", "OR"]):
+    separator = f" ) {type} ( "
+
+    def parts(args: tuple) -> list:
+        # As binary nodes nested to the left would render, ( ( arg1 ) AND ( arg2 ) )
+        # AND ... ( argN ), reversed
+        reversed_parts: list = []
+        for arg in reversed(args[1:]):
+            reversed_parts += (" )", arg, separator)
+        reversed_parts += (args[0], "( " * (len(args) - 1))
+        return reversed_parts
+
+    return parts
+
+
+# Per node type: the text fragments and arguments of its rendering, in reverse order
+# (to be pushed on a stack). One lookup per node instead of a chain of comparisons.
+STR_PARTS: dict[str, t.Callable[[tuple], t.Sequence]] = {
+    "VALUE": lambda args: (args[0],),
+    "FIELD": lambda args: (args[0],),
+    "VAL_RANGE": lambda args: (args[1], "~~", args[0]),
+    "FIELD_EQ": lambda args: (args[1], ":", args[0]),
+    "NOT": lambda args: (" )", args[0], "NOT ( "),
+    "AND": _junction_parts("AND"),
+    "OR": _junction_parts("OR"),
+}
 
 
 type DATE_TYPES = date | datetime
@@ -53,22 +115,38 @@ type FIELD_TYPES = str | int
 
 
 # MARK: Terminals
+# Nodes are immutable, so terminals can be shared: a query vocabulary is small.
 def VALUE(value: VALUE_TYPES):
     """Create a field value, escaped where necessary"""
-    if isinstance(value, str) and " " in value:
-        value = f'"{value}"'
+    if isinstance(value, str):
+        return _str_value(value)
     if isinstance(value, datetime):
-        value = value.isoformat(sep="T", timespec="minutes")
-    if isinstance(value, date):
-        value = value.isoformat()
-    return SEASTNode(type="VALUE", args=(str(value), None))
+        text = value.isoformat(sep="T", timespec="minutes")
+    elif isinstance(value, date):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    return SEASTNode(type="VALUE", args=(text, None))
+
+
+# Only strings are shared. Other values can be equal, and so share a cache entry, yet
+# render differently: like the same instant in two timezones, or 0.0 and -0.0.
+# typed=True keeps str subclasses (enums) apart from plain strings.
+@functools.lru_cache(maxsize=256, typed=True)
+def _str_value(value: str):
+    text = f'"{value}"' if " " in value else value
+    return SEASTNode(type="VALUE", args=(text, None))
 
 
+@functools.lru_cache(maxsize=256, typed=True)
 def FIELD(fieldname: FIELD_TYPES):
     """Create a field"""
     return SEASTNode(type="FIELD", args=(str(fieldname), None))
 
 
+_EMPTY_VALUE = VALUE("")
+
+
 # MARK: Non-terminals
 def VAL_RANGE(start_value: SEASTNode, end_value: SEASTNode):
     """Create a ranged field value"""
@@ -77,32 +155,40 @@ def VAL_RANGE(start_value: SEASTNode, end_value: SEASTNode):
 
 def FIELD_EMPTY(field: SEASTNode):
     """Create an empty field expression"""
-    return SEASTNode(type="FIELD_EQ", args=(field, VALUE("")))
+    return SEASTNode(type="FIELD_EQ", args=(field, _EMPTY_VALUE))
 
 
 def FIELD_EQ(field: SEASTNode, value: SEASTNode):
     """Create an field value expression"""
     if not isinstance(value, SEASTNode) or field.type != "FIELD":
-        raise NotImplementedError()
+        raise TypeError("FIELD_EQ takes a FIELD node and a value node")
     return SEASTNode(type="FIELD_EQ", args=(field, value))
 
 
 def NOT(lhs: SEASTNode):
     """Negate a search expression"""
     if not isinstance(lhs, SEASTNode):
-        raise NotImplementedError()
+        raise TypeError("NOT takes a search expression node")
     return SEASTNode(type="NOT", args=(lhs, None))
 
 
 def OR(lhs: SEASTNode, rhs: SEASTNode):
     """Combine two search expressions with OR"""
     if not isinstance(rhs, SEASTNode):
-        raise NotImplementedError()
-    return SEASTNode(type="OR", args=(lhs, rhs))
+        raise TypeError("OR takes two search expression nodes")
+    return _associative("OR", lhs, rhs)
 
 
 def AND(lhs: SEASTNode, rhs: SEASTNode):
     """Combine two search expressions with AND"""
     if not isinstance(rhs, SEASTNode):
-        raise NotImplementedError()
-    return SEASTNode(type="AND", args=(lhs, rhs))
+        raise TypeError("AND takes two search expression nodes")
+    return _associative("AND", lhs, rhs)
+
+
+def _associative(type: t.Literal["AND", "OR"], lhs: SEASTNode, rhs: SEASTNode):
+    # (a AND b) AND c: merge the operands of a left operand of the same operator into
+    # a single node, so that fluent chains don't nest a level deeper on every step. A
+    # right operand stays a node of its own, so that the query renders as it's built.
+    lhs_args = lhs.args if lhs.type == type else (lhs,)
+    return SEASTNode(type=type, args=(*lhs_args, rhs))
@@ -1,4 +1,5 @@
 import typing as t
+from urllib.parse import quote_from_bytes
 
 from pyfwapi.errors import SearchSyntaxError
 from pyfwapi.model.asset import (
@@ -22,6 +23,14 @@ from pyfwapi.search.ast import (
 )
 from pyfwapi.search.predicates import Ranged, StrSpecial
 
+# The "from" and "to" predicates of ranged fields, like mtf and mtt
+RANGED_KEYS = {r: (r + "f", r + "t") for r in Ranged}
+
+# The fields of specialized matching methods, built once
+COLORSPACE_FIELD = FIELD(StrSpecial.ColorSpace)
+IMAGE_ORIENTATION_FIELD = FIELD(StrSpecial.ImageOrientation)
+ASSETTYPE_FIELD = FIELD(StrSpecial.AssetType)
+
 
 class SE:
     """
@@ -39,15 +48,22 @@ class SE:
 
     Some fields have specialized matching functions, like `assettype`, `colorspace`,
     `image_orientation`, `modification`, `filesize`, `pixel_height`, `pixel_width`.
+    The ranged ones take a `min` and a `max`. Passing neither adds no filter, unless
+    `required=True`: then it raises a SearchSyntaxError.
     """
 
     # Reference: <https://learn.fotoware.com/FotoWare_SaaS/Navigating_and_searching_to_find_your_assets/Searching_in_FotoWare/001_Searching_for_assets/FotoWare_Search_Expressions_Reference>
 
+    __slots__ = ("data",)
     data: SEASTNode | None
 
     def __init__(self, ast: SEASTNode | None = None) -> None:
         self.data = ast
 
+    def _extend(self, ast: SEASTNode):
+        """A copy of this SE, with `ast` ANDed to it."""
+        return SE(ast if self.data is None else AND(self.data, ast))
+
     def fts(self, value: str, /):
         """
         Search across all metadata (full text search).
@@ -56,7 +72,7 @@ class SE:
         """
 
         ast = VALUE(value)
-        return SE(AND(self.data, ast) if self.data else ast)
+        return self._extend(ast)
 
     def empty(self, field: str | int, /):
         """
@@ -66,7 +82,7 @@ class SE:
         tenant, the index manager is accessible by customer support.
         """
         ast = FIELD_EMPTY(FIELD(field))
-        return SE(AND(self.data, ast) if self.data else ast)
+        return self._extend(ast)
 
     @t.overload
     def eq(self, field: StrSpecial, value: str, /): ...
@@ -76,22 +92,22 @@ class SE:
         """Search for an exact field value."""
 
         ast = FIELD_EQ(FIELD(field), VALUE(value))
-        return SE(AND(self.data, ast) if self.data else ast)
+        return self._extend(ast)
 
     def colorspace(self, value: ColorSpaceValues, /) -> t.Self:
         """Filter to certain colorspaces."""
-        return self.eq(StrSpecial.ColorSpace, value)
+        return self._extend(FIELD_EQ(COLORSPACE_FIELD, VALUE(value)))
 
     def image_orientation(self, value: ImageOrientationValues, /) -> t.Self:
         """
         Filter for certain image orientations. Square images are simultaneously both
         portrait and landscape.
         """
-        return self.eq(StrSpecial.ImageOrientation, value)
+        return self._extend(FIELD_EQ(IMAGE_ORIENTATION_FIELD, VALUE(value)))
 
     def assettype(self, value: AssetTypeValues, /) -> t.Self:
         """Filter for asset type."""
-        return self.eq(StrSpecial.AssetType, value)
+        return self._extend(FIELD_EQ(ASSETTYPE_FIELD, VALUE(value)))
 
     def range(self, field: FIELD_TYPES | Ranged, min: VALUE_TYPES, max: VALUE_TYPES, /):
         """
@@ -99,48 +115,70 @@ class SE:
         processes floats as if they were `floor()`ed to integers.
         """
         ast = FIELD_EQ(FIELD(field), VAL_RANGE(VALUE(min), VALUE(max)))
-        return SE(AND(self.data, ast) if self.data else ast)
+        return self._extend(ast)
 
     def _minmax(
-        self, field: Ranged, min: VALUE_TYPES | None, max: VALUE_TYPES | None, /
+        self,
+        field: Ranged,
+        min: VALUE_TYPES | None,
+        max: VALUE_TYPES | None,
+        /,
+        *,
+        required: bool = False,
     ):
         if min is not None and max is not None:
             return self.range(field, min, max)
+        from_key, to_key = RANGED_KEYS[field]
         if min is not None:
-            return self.eq(str(field) + "f", min)
+            return self.eq(from_key, min)
         if max is not None:
-            return self.eq(str(field) + "t", max)
-        raise SearchSyntaxError("A ranged value must have either a min, a max or both.")
-
-    def modification(self, min: DATE_TYPES | None, max: DATE_TYPES | None, /):
+            return self.eq(to_key, max)
+        if required:
+            raise SearchSyntaxError(
+                "A ranged value must have either a min, a max or both."
+            )
+        return self  # Unbounded: nothing to filter on. SEs are never modified.
+
+    def modification(
+        self,
+        min: DATE_TYPES | None,
+        max: DATE_TYPES | None,
+        /,
+        *,
+        required: bool = False,
+    ):
         """Filter for file modification datetime"""
-        return self._minmax(Ranged.FileModification, min, max)
+        return self._minmax(Ranged.FileModification, min, max, required=required)
 
-    def filesize(self, min: int | None, max: int | None, /):
+    def filesize(self, min: int | None, max: int | None, /, *, required: bool = False):
         """Filter for file size"""
-        return self._minmax(Ranged.FileSize, min, max)
+        return self._minmax(Ranged.FileSize, min, max, required=required)
 
-    def pixel_height(self, min: int | None, max: int | None, /):
+    def pixel_height(
+        self, min: int | None, max: int | None, /, *, required: bool = False
+    ):
         """Filter for image pixel height"""
-        return self._minmax(Ranged.PixelHeight, min, max)
+        return self._minmax(Ranged.PixelHeight, min, max, required=required)
 
-    def pixel_width(self, min: int | None, max: int | None, /):
+    def pixel_width(
+        self, min: int | None, max: int | None, /, *, required: bool = False
+    ):
         """Filter for image pixel width"""
-        return self._minmax(Ranged.PixelWidth, min, max)
+        return self._minmax(Ranged.PixelWidth, min, max, required=required)
 
     def NOT(self, other: t.Self | None = None, /):
         """
         This negates the passed Search Expression or negates the current built
         SearchExpression.
         """
-        if self.data:
-            if other and other.data:
-                return SE(AND(self.data, NOT(other.data)))
-
-            return SE(NOT(self.data))  # zero argument, negates itself
+        data, other_data = self.data, other.data if other is not None else None
 
-        if other and other.data:
-            return SE(NOT(other.data))
+        if data is not None and other_data is not None:
+            return SE(AND(data, NOT(other_data)))
+        if data is not None:
+            return SE(NOT(data))  # zero argument, negates itself
+        if other_data is not None:
+            return SE(NOT(other_data))
 
         raise SearchSyntaxError("Uninitialized SE in a NOT expression")
 
@@ -156,7 +194,7 @@ class SE:
     def __or__(self, other):
         """Combine two `SE`s with OR"""
         if not isinstance(other, self.__class__):
-            raise NotImplementedError()
+            return NotImplemented
         return self.OR(other)
 
     def AND(self, other: t.Self, /):
@@ -167,12 +205,19 @@ class SE:
     def __and__(self, other):
         """Combine two `SE`s with AND"""
         if not isinstance(other, self.__class__):
-            raise NotImplementedError()
+            return NotImplemented
         return self.AND(other)
 
     def __str__(self) -> str:
         return str(self.data)
 
+    def to_query_param(self) -> str:
+        """
+        The URL-encoded expression, for the `q` parameter of a search URL. Pass it to
+        `Tenant.match_assets(..., encoded=True)` to reuse it across searches.
+        """
+        return quote_from_bytes(str(self).strip().encode())
+
     def __repr__(self) -> str:
         return f"""SE(ast={repr(self.data)})"""
 
@@ -1,7 +1,11 @@
+import functools
 import typing as t
-from urllib.parse import quote
+from urllib.parse import quote_from_bytes
 
-from pyfwapi.apiconnection import APIConnection
+from aiostream import stream
+from pydantic import TypeAdapter
+
+from pyfwapi.apiconnection import BINARY_HEADERS, STREAM_CHUNK_SIZE, APIConnection
 from pyfwapi.errors import CollectionNotSearchable
 from pyfwapi.log import pyfwapiLog
 from pyfwapi.model.asset import Asset
@@ -14,8 +18,15 @@ from pyfwapi.model.instance_info import (
 from pyfwapi.model.preview_rendition import AssetPreview, AssetRendition
 from pyfwapi.search.search_expression import SE
 from pyfwapi.util.alist import alist
+from pyfwapi.util.ttl_cache import TTLCache
 
 FOTOWARE_QUERY_PLACEHOLDER = "{?q}"
+DESCRIPTOR_TTL = 3600  # seconds
+SEARCH_CONCURRENCY = 8  # archives searched at the same time
+
+# Parse and validate unpaged JSON lists in one go, without an intermediate dict
+FIELD_NAMESPACES = TypeAdapter(list[FieldNamespace])
+KNOWN_METADATA_FIELDS = TypeAdapter(list[KnownMetadataField])
 
 
 class Tenant:
@@ -37,7 +48,9 @@ class Tenant:
         Connect to an tenant (instance) of FotoWare. This is the core class to iterate
         archives and assets and to search for specific assets.
 
-        Pass in either a connection or an endpoint with client credentials.
+        Pass in either a connection or an endpoint with client credentials. Use it as
+        `async with Tenant(...) as fw:` to close its connections afterwards. A passed-in
+        connection is left open: it's owned by the caller.
 
         Args:
             url: URL of the endpoint, e.g. `https://myorg.fotoware.cloud`
@@ -54,10 +67,35 @@ class Tenant:
             )
         else:
             self.api = connection
+        self.owns_connection = connection is None
+
+        self.descriptors: TTLCache[str, t.Any] = TTLCache(ttl=DESCRIPTOR_TTL)
+
+    async def __aenter__(self) -> t.Self:
+        await self.api.warmup()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.owns_connection:
+            await self.api.aclose()
+
+    def invalidate(self, path: str | None = None) -> None:
+        """
+        Forget a cached descriptor, asset or archive by its path, like `/fotoweb/me` or
+        an asset's href, so that it is fetched again on next use. Forgets everything if
+        no path is passed.
+        """
+        self.descriptors.invalidate(path)
+        self.api.resources.invalidate(path)
 
     async def instance_info(self) -> FullAPIDescriptor:
-        d = await self.api.GET("/fotoweb/me")
-        return FullAPIDescriptor.model_validate_json(d.content)
+        """The API descriptor of this tenant. Cached, as it rarely changes."""
+        info = self.descriptors.get("/fotoweb/me")
+        if info is None:
+            d = await self.api.GET("/fotoweb/me")
+            info = FullAPIDescriptor.model_validate_json(d.content)
+            self.descriptors.set("/fotoweb/me", info)
+        return info
 
     # MARK: Archives
     async def iter_archives(self) -> t.AsyncGenerator[Collection, None]:
@@ -68,9 +106,14 @@ class Tenant:
             yield archive
 
     async def archive_by(self, *, id: int) -> Collection:
-        """Get the archive with archive ID."""
-        d = await self.api.GET(f"/fotoweb/archives/{id}")
-        return Collection.model_validate_json(d.content)
+        """Get the archive with archive ID. Cached for a minute."""
+        path = f"/fotoweb/archives/{id}"
+        archive = self.api.resources.get(path)
+        if not isinstance(archive, Collection):
+            d = await self.api.GET(path)
+            archive = Collection.model_validate_json(d.content)
+            self.api.resources.set(path, archive)
+        return archive
 
     # MARK: Assets
     async def iter_assets(
@@ -81,32 +124,74 @@ class Tenant:
             yield asset
 
     async def asset_by(self, *, href: str) -> Asset:
-        """Get the asset with its href ID."""
-        d = await self.api.GET(href)
-        return Asset.model_validate_json(d.content)
+        """
+        Get the asset with its href ID. Cached for a minute, or until a ChangeManager on
+        the same connection commits a change to it.
+        """
+        asset = self.api.resources.get(href)
+        if not isinstance(asset, Asset):
+            d = await self.api.GET(href)
+            asset = Asset.model_validate_json(d.content)
+            self.api.resources.set(href, asset)
+        return asset
 
     async def match_assets(
-        self, query: str | SE, *, in_archives: t.Iterable[Collection] | None = None
+        self,
+        query: str | SE,
+        *,
+        in_archives: t.Iterable[Collection] | None = None,
+        encoded: bool = False,
+        ordered: bool = False,
+        concurrency: int = SEARCH_CONCURRENCY,
     ) -> t.AsyncGenerator[Asset, None]:
         """
-        Search archives with a query for certain assets.
+        Search archives with a query for certain assets. The archives are searched
+        concurrently: assets from different archives are yielded as they arrive.
 
         Args:
             query: This should be a built SE (SearchExpression), but can also be a
                 simple correctly formed string.
             in_archives: The archives (or other collections) to search in.
+            encoded: the query is a string that is already URL-encoded, like the
+                result of `SE.to_query_param()`, and is used as is. Raises a TypeError
+                for an SE.
+            ordered: search the archives one after the other, yielding all results of
+                an archive before those of the next
+            concurrency: how many archives may be searched at the same time
         """
-        archives = in_archives or await alist(self.iter_archives())
+        # Render the query once, not for every archive
+        if encoded:
+            if not isinstance(query, str):
+                raise TypeError("An encoded query must be a str, not an SE")
+            param = query
+        elif isinstance(query, SE):
+            param = query.to_query_param()
+        else:
+            param = quote_from_bytes(query.strip().encode())
+        q = ";o=+?q=" + param  # order by oldest modified
 
+        archives = in_archives or await alist(self.iter_archives())
+        # Check every archive before any search starts
+        query_urls: list[str] = []
         for a in archives:
             search_base_url = a.searchURL
             if search_base_url is None:
-                pyfwapiLog.error(f"Collection '{a}' cannot be searched")
+                pyfwapiLog.error("Collection '%s' cannot be searched", a)
                 raise CollectionNotSearchable("Collection '{a}' has no searchURL")
 
-            q = ";o=+?q=" + quote(str(query).strip())  # order by oldest modified
-            query_url = search_base_url.replace(FOTOWARE_QUERY_PLACEHOLDER, q)
-            async for asset in self.api.paginated(query_url, type=Asset):
+            prefix, suffix = split_search_url(search_base_url)
+            query_urls.append(prefix + q + suffix)
+
+        searches = [self.api.paginated(url, type=Asset) for url in query_urls]
+        if ordered:
+            for search in searches:
+                async for asset in search:
+                    yield asset
+            return
+
+        merged = stream.flatten(stream.iterate(searches), task_limit=concurrency)
+        async with merged.stream() as assets:
+            async for asset in assets:
                 yield asset
 
     # MARK: Previews, renditions
@@ -119,23 +204,68 @@ class Tenant:
             "GET",
             self.api.HOST + preview.href,
             withhold_token=True,
-            headers={"Authorization": f"Bearer {asset.previewToken}"},
+            headers={**BINARY_HEADERS, "Authorization": f"Bearer {asset.previewToken}"},
         )
 
         r.raise_for_status()
         return r.aiter_bytes()
 
+    async def iter_preview(
+        self,
+        asset: Asset,
+        preview: AssetPreview,
+        *,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> t.AsyncGenerator[bytes, None]:
+        """
+        Stream the preview image in chunks, without reading it into memory at once.
+        The connection is released as soon as the stream is consumed or closed.
+        """
+
+        async with self.api.client.stream(
+            "GET",
+            self.api.HOST + preview.href,
+            withhold_token=True,
+            headers={**BINARY_HEADERS, "Authorization": f"Bearer {asset.previewToken}"},
+        ) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes(chunk_size):
+                yield chunk
+
     async def get_rendition(
-        self, rendition: AssetRendition, endpoint: str
+        self,
+        rendition: AssetRendition,
+        endpoint: str,
+        *,
+        max_wait: float | None = None,
     ) -> t.AsyncIterator[bytes]:
         """
         Initiate a rendition request at the rendition request endpoint
-        and wait until the bytestream is available
+        and wait until the bytestream is available, for at most `max_wait` seconds
         """
         location = await self.request_rendition(rendition, endpoint)
-        r = await self.api.retrying(location)
+        r = await self.api.retrying(location, max_wait=max_wait)
         return r.aiter_bytes()
 
+    async def iter_rendition(
+        self,
+        rendition: AssetRendition,
+        endpoint: str,
+        *,
+        max_wait: float | None = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> t.AsyncGenerator[bytes, None]:
+        """
+        Initiate a rendition request and stream the rendition in chunks once it is
+        available (waiting for at most `max_wait` seconds), without reading it into
+        memory at once.
+        """
+        location = await self.request_rendition(rendition, endpoint)
+        async for chunk in self.api.retrying_stream(
+            location, max_wait=max_wait, chunk_size=chunk_size
+        ):
+            yield chunk
+
     async def request_rendition(self, rendition: AssetRendition, endpoint: str) -> str:
         """
         Start a rendition request at the rendition request endpoint
@@ -146,7 +276,7 @@ class Tenant:
         """
 
         r = await self.api.POST(
-            self.api.HOST + endpoint,
+            endpoint,
             headers={
                 "Content-Type": "application/vnd.fotoware.rendition-request+json",
                 "Accept": "application/vnd.fotoware.rendition-response+json",
@@ -157,15 +287,33 @@ class Tenant:
         return r.headers["Location"]
 
 
+@functools.lru_cache(maxsize=256)
+def split_search_url(search_url: str) -> tuple[str, str]:
+    """The parts of a searchURL before and after its query placeholder."""
+    prefix, _, suffix = search_url.partition(FOTOWARE_QUERY_PLACEHOLDER)
+    return prefix, suffix
+
+
 class UnstableTenant(Tenant):
     async def namespaces(self) -> t.AsyncGenerator[FieldNamespace, None]:
-        d = await self.api.GET("/fotoweb/api/config/metadata/namespaces")
-        for namespace in d.json():
+        # Cached like instance_info(): the configuration rarely changes
+        path = "/fotoweb/api/config/metadata/namespaces"
+        namespaces = self.descriptors.get(path)
+        if namespaces is None:
+            d = await self.api.GET(path)
+            namespaces = FIELD_NAMESPACES.validate_json(d.content)
+            self.descriptors.set(path, namespaces)
+        for namespace in namespaces:
             yield namespace
 
     async def known_fields(
         self,
     ) -> t.AsyncGenerator[KnownMetadataField, None]:
-        d = await self.api.GET("/fotoweb/api/config/metadata/fields/known")
-        for field in d.json():
+        path = "/fotoweb/api/config/metadata/fields/known"
+        fields = self.descriptors.get(path)
+        if fields is None:
+            d = await self.api.GET(path)
+            fields = KNOWN_METADATA_FIELDS.validate_json(d.content)
+            self.descriptors.set(path, fields)
+        for field in fields:
             yield field
@@ -2,4 +2,4 @@ import typing as t
 
 
 async def alist[T](iterable: t.AsyncIterable[T]) -> t.List[T]:
-    return list([i async for i in iterable])
+    return [i async for i in iterable]
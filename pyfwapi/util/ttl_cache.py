@@ -0,0 +1,42 @@
+import time
+
+
+class TTLCache[K, V]:
+    """
+    A small in-process cache whose entries expire after `ttl` seconds. With a
+    `maxsize`, the least recently used entry makes way for a new one once it is full.
+    """
+
+    def __init__(self, *, ttl: float, maxsize: int | None = None) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[K, tuple[float, V]] = dict()
+
+    def get(self, key: K) -> V | None:
+        """The cached value, or None if it is missing or expired."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        expires, value = entry
+        if time.monotonic() >= expires:
+            return None
+        self._entries[key] = entry  # re-inserted last: the most recently used
+        return value
+
+    def set(self, key: K, value: V) -> V:
+        self._entries.pop(key, None)
+        if self.maxsize is not None and len(self._entries) >= self.maxsize:
+            # Dicts keep insertion order: the first entry is the least recently used
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key: K | None = None) -> None:
+        """Drop a single key, or everything if no key is passed."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+__all__ = ["TTLCache"]
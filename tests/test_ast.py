@@ -0,0 +1,63 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from pyfwapi.search.ast import VALUE
+from pyfwapi.search.search_expression import SE
+
+
+class ValueTest(unittest.TestCase):
+    def test_equal_datetimes_render_their_own_timezone(self):
+        utc = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        cest = datetime(2024, 1, 1, 14, tzinfo=timezone(timedelta(hours=2)))
+        self.assertEqual(str(VALUE(utc)), "2024-01-01T12:00+00:00")
+        self.assertEqual(str(VALUE(cest)), "2024-01-01T14:00+02:00")
+
+    def test_signed_zero(self):
+        self.assertEqual(str(VALUE(0.0)), "0.0")
+        self.assertEqual(str(VALUE(-0.0)), "-0.0")
+
+    def test_strings_are_shared(self):
+        self.assertIs(VALUE("a b"), VALUE("a b"))
+        self.assertEqual(str(VALUE("a b")), '"a b"')
+
+
+class JunctionTest(unittest.TestCase):
+    """Flat AND and OR nodes render like the binary nodes they replace"""
+
+    def setUp(self):
+        self.a, self.b, self.c, self.d = (SE().fts(s) for s in "abcd")
+
+    def test_fluent_chain(self):
+        self.assertEqual(
+            str(SE().fts("a").fts("b").fts("c")), "( ( a ) AND ( b ) ) AND ( c )"
+        )
+
+    def test_left_chain_is_flat(self):
+        a, b, c = self.a, self.b, self.c
+        self.assertEqual(len((a | b | c).data.args), 3)
+        self.assertEqual(str(a | b | c), "( ( a ) OR ( b ) ) OR ( c )")
+
+    def test_right_operand_keeps_its_group(self):
+        a, b, c, d = self.a, self.b, self.c, self.d
+        self.assertEqual(str(a | (b | c)), "( a ) OR ( ( b ) OR ( c ) )")
+        self.assertEqual(
+            str((a | b) | (c | d)), "( ( a ) OR ( b ) ) OR ( ( c ) OR ( d ) )"
+        )
+
+    def test_mixed_operators(self):
+        a, b, c, d = self.a, self.b, self.c, self.d
+        self.assertEqual(
+            str((a & b) | (c & d)), "( ( a ) AND ( b ) ) OR ( ( c ) AND ( d ) )"
+        )
+        self.assertEqual(
+            str(SE().fts("a b").eq("fn", "*.png") | SE().filesize(1, None)),
+            '( ( "a b" ) AND ( fn:*.png ) ) OR ( fsf:1 )',
+        )
+
+    def test_negated_chain(self):
+        a, b, c = self.a, self.b, self.c
+        self.assertEqual(str(-(a & b & c)), "NOT ( ( ( a ) AND ( b ) ) AND ( c ) )")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import json
+import time
+import unittest
+
+import httpx
+
+from pyfwapi.apiconnection import APIConnection
+from pyfwapi.change.stateful import (
+    BaseChangeManager,
+    ChangeTask,
+    MetadataRequest,
+    MoveRequest,
+)
+
+HREF = "/fotoweb/archives/5000/a.jpg.info"
+OTHER_HREF = "/fotoweb/archives/5000/b.jpg.info"
+DESTINATION = "/fotoweb/archives/5001/"
+OTHER_DESTINATION = "/fotoweb/archives/5002/"
+MOVE_TASK = {
+    "maxInterval": 1,
+    "location": "/fotoweb/me/background-tasks/1",
+    "status": "pending",
+}
+
+
+class ChangeTestCase(unittest.IsolatedAsyncioTestCase):
+    """A change manager and a connection to a mocked API, with a valid token"""
+
+    async def asyncSetUp(self):
+        self.requests: list[httpx.Request] = []
+        # HTTP method -> status code of the mocked responses, 200 by default
+        self.status_codes: dict[str, int] = {}
+
+        self.conn = APIConnection(
+            "https://fw.example.org", client_id="id", client_secret="secret"
+        )
+        self.conn.client.token = {
+            "access_token": "token",
+            "token_type": "bearer",
+            "expires_at": time.time() + 3600,
+        }
+        self.conn.client._transport = httpx.MockTransport(self.handle)
+        self.manager = BaseChangeManager()
+
+    async def asyncTearDown(self):
+        await self.conn.aclose()
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        body = MOVE_TASK if request.method == "POST" else {}
+        return httpx.Response(self.status_codes.get(request.method, 200), json=body)
+
+
+class MetadataChangeTest(ChangeTestCase):
+    async def test_changes_to_an_asset_are_merged_into_one_patch(self):
+        first = self.manager.add_task(
+            ChangeTask(change=MetadataRequest(HREF, {5: {"value": "a"}}))
+        )
+        second = self.manager.add_task(
+            ChangeTask(
+                change=MetadataRequest(HREF, {5: {"value": "b"}, 6: {"value": "c"}})
+            )
+        )
+        self.assertIs(first, second)
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertEqual(len(self.requests), 1)
+        [patch] = self.requests
+        self.assertEqual(patch.method, "PATCH")
+        self.assertEqual(patch.url.path, HREF)
+        self.assertEqual(
+            json.loads(patch.content),
+            {"metadata": {"5": {"value": "b"}, "6": {"value": "c"}}},
+        )
+
+    async def test_changes_to_other_assets_are_not_merged(self):
+        self.manager.add_task(
+            ChangeTask(change=MetadataRequest(HREF, {5: {"value": "a"}}))
+        )
+        self.manager.add_task(
+            ChangeTask(change=MetadataRequest(OTHER_HREF, {5: {"value": "a"}}))
+        )
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertEqual(sorted(r.url.path for r in self.requests), [HREF, OTHER_HREF])
+
+    async def test_committed_change_is_not_merged_into(self):
+        first = self.manager.add_task(
+            ChangeTask(change=MetadataRequest(HREF, {5: {"value": "a"}}))
+        )
+        await self.manager.commit(conn=self.conn)
+        second = self.manager.add_task(
+            ChangeTask(change=MetadataRequest(HREF, {6: {"value": "b"}}))
+        )
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first.change.new_metadata, {5: {"value": "a"}})
+
+
+class MoveChangeTest(ChangeTestCase):
+    async def test_moves_to_a_destination_are_merged_into_one_task(self):
+        first = self.manager.add_task(
+            ChangeTask(change=MoveRequest([HREF], DESTINATION))
+        )
+        second = self.manager.add_task(
+            ChangeTask(change=MoveRequest([OTHER_HREF], DESTINATION))
+        )
+        self.assertIs(first, second)
+        self.assertEqual(first.change.asset_hrefs, [HREF, OTHER_HREF])
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertEqual(len(self.requests), 1)
+        [post] = self.requests
+        self.assertEqual(post.method, "POST")
+        self.assertEqual(
+            json.loads(post.content),
+            {
+                "assets": [{"href": HREF}, {"href": OTHER_HREF}],
+                "job-destination": DESTINATION,
+            },
+        )
+        self.assertEqual(first.status, "submitted")
+        self.assertEqual(
+            self.manager.task_statuslocation[first.id], MOVE_TASK["location"]
+        )
+
+    async def test_moves_to_other_destinations_are_not_merged(self):
+        first = self.manager.add_task(
+            ChangeTask(change=MoveRequest([HREF], DESTINATION))
+        )
+        second = self.manager.add_task(
+            ChangeTask(change=MoveRequest([OTHER_HREF], OTHER_DESTINATION))
+        )
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_submitted_move_is_not_merged_into(self):
+        first = self.manager.add_task(
+            ChangeTask(change=MoveRequest([HREF], DESTINATION))
+        )
+        await self.manager.commit(conn=self.conn)
+        second = self.manager.add_task(
+            ChangeTask(change=MoveRequest([OTHER_HREF], DESTINATION))
+        )
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first.change.asset_hrefs, [HREF])
+
+
+class CommitStatusTest(ChangeTestCase):
+    async def test_successful_patch_is_done(self):
+        task = self.manager.add_task(
+            ChangeTask(change=MetadataRequest(HREF, {5: {"value": "a"}}))
+        )
+        self.assertEqual(task.status, "uncommitted")
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertEqual(task.status, "done")
+        self.assertEqual(self.manager.by_status["done"], {task.id})
+        self.assertEqual(self.manager.by_status["uncommitted"], set())
+
+    async def test_failed_patch_is_failed(self):
+        self.status_codes["PATCH"] = 400
+        task = self.manager.add_task(
+            ChangeTask(change=MetadataRequest(HREF, {5: {"value": "a"}}))
+        )
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertEqual(task.status, "failed")
+        self.assertEqual(self.manager.by_status["failed"], {task.id})
+
+    async def test_raising_commit_fails_only_its_own_task(self):
+        self.status_codes["POST"] = 500
+        move = self.manager.add_task(
+            ChangeTask(change=MoveRequest([HREF], DESTINATION))
+        )
+        patch = self.manager.add_task(
+            ChangeTask(change=MetadataRequest(OTHER_HREF, {5: {"value": "a"}}))
+        )
+
+        await self.manager.commit(conn=self.conn)
+
+        self.assertEqual(move.status, "failed")
+        self.assertEqual(patch.status, "done")
+        self.assertEqual(self.manager.by_status["failed"], {move.id})
+        self.assertEqual(self.manager.by_status["done"], {patch.id})
+        self.assertEqual(len(self.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
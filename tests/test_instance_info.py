@@ -0,0 +1,89 @@
+import json
+import unittest
+
+from pyfwapi.tenant import FIELD_NAMESPACES, KNOWN_METADATA_FIELDS
+
+# As returned by /fotoweb/api/config/metadata/fields/known
+KNOWN_FIELDS = [
+    {
+        "Id": 5,
+        "Name": "title",
+        "GuiLabel": "Title",
+        "FieldType": "Single",
+        "ValueType": "Text",
+        "Namespace": "http://purl.org/dc/elements/1.1/",
+        "NamespaceLabel": "Dublin Core",
+        "MaxSize": 0,
+        "StructName": "",
+        "StructLabel": "",
+        "AdobeName": "dc:title",
+        "CoreName": "",
+        "IsMultiline": False,
+    },
+    {
+        "Id": 25,
+        "Name": "subject",
+        "GuiLabel": "Keywords",
+        "FieldType": "Bag",
+        "ValueType": "Text",
+        "Namespace": "http://purl.org/dc/elements/1.1/",
+        "NamespaceLabel": "Dublin Core",
+        "MaxSize": 64,
+        "StructName": "",
+        "StructLabel": "",
+        "AdobeName": "",
+        "CoreName": "",
+        "IsMultiline": False,
+    },
+    {
+        "Id": 640,
+        "Name": "CiAdrCity",
+        "GuiLabel": "Creator's City",
+        "FieldType": "Single",
+        "ValueType": "Text",
+        "Namespace": "http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/",
+        "NamespaceLabel": "IPTC Core",
+        "MaxSize": 0,
+        "StructName": "CreatorContactInfo",
+        "StructLabel": "Creator's Contact Info",
+        "AdobeName": "",
+    },
+]
+
+# As returned by /fotoweb/api/config/metadata/namespaces
+NAMESPACES = [
+    {
+        "Url": "http://purl.org/dc/elements/1.1/",
+        "Alias": "dc",
+        "Name": "Dublin Core",
+    },
+]
+
+
+class KnownMetadataFieldsTest(unittest.TestCase):
+    def test_known_fields(self):
+        fields = KNOWN_METADATA_FIELDS.validate_json(json.dumps(KNOWN_FIELDS))
+        self.assertEqual([f.id for f in fields], [5, 25, 640])
+
+    def test_empty_struct_names(self):
+        title, keywords, _ = KNOWN_METADATA_FIELDS.validate_json(
+            json.dumps(KNOWN_FIELDS)
+        )
+        self.assertIsNone(title.struct_name)
+        self.assertIsNone(title.core_name)
+        self.assertEqual(title.adobe_name, "dc:title")
+        self.assertIsNone(keywords.adobe_name)
+
+    def test_struct_field(self):
+        *_, city = KNOWN_METADATA_FIELDS.validate_json(json.dumps(KNOWN_FIELDS))
+        self.assertEqual(city.struct_name, "CreatorContactInfo")
+        self.assertIsNone(city.core_name)  # missing
+        self.assertFalse(city.is_multiline)
+
+    def test_namespaces(self):
+        (dc,) = FIELD_NAMESPACES.validate_json(json.dumps(NAMESPACES))
+        self.assertEqual(dc.alias, "dc")
+
+
+if __name__ == "__main__":
+    unittest.main()
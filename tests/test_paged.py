@@ -0,0 +1,53 @@
+import json
+import unittest
+
+from pydantic import ValidationError
+
+from pyfwapi.apiconnection import page_adapter
+from pyfwapi.model.asset import Asset
+
+ASSET = dict(
+    href="/fotoweb/archives/5000/a.jpg.info",
+    physicalFileId="p1",
+    linkstance="l",
+    filename="a.jpg",
+    filesize=3,
+    doctype="image",
+    created=None,
+    modified=None,
+    archiveId=5000,
+    archiveHREF="/fotoweb/archives/5000/",
+    builtinFields=[],
+    metadata={},
+    previews=None,
+    previewToken="token",
+    renditions=None,
+    quickRenditions=None,
+)
+INVALID_ASSET = {**ASSET, "filesize": "not a number"}
+
+
+class PageAdapterTest(unittest.TestCase):
+    def validate(self, page: dict):
+        return page_adapter(Asset).validate_json(json.dumps(page))
+
+    def test_page(self):
+        page = self.validate({"data": [ASSET], "paging": None})
+        self.assertEqual([a.href for a in page.data], [ASSET["href"]])
+
+    def test_nested_page(self):
+        page = self.validate({"assets": {"data": [ASSET]}})
+        self.assertEqual([a.href for a in page.assets.data], [ASSET["href"]])
+
+    def test_invalid_asset_in_page(self):
+        with self.assertRaises(ValidationError):
+            self.validate({"data": [ASSET, INVALID_ASSET]})
+
+    def test_invalid_asset_in_nested_page(self):
+        # Must not pass as a page without data, which would end the search silently
+        with self.assertRaises(ValidationError):
+            self.validate({"assets": {"data": [ASSET, INVALID_ASSET]}})
+
+
+if __name__ == "__main__":
+    unittest.main()